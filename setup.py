@@ -8,7 +8,6 @@ setup(
     install_requires=[
         'click>=8.1.7',
         'rich>=13.7.0',
-        'python-dateutil>=2.8.2',
         'tabulate>=0.9.0',
     ],
     entry_points={
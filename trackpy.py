@@ -2,183 +2,308 @@
 
 import click
 import sqlite3
-from datetime import datetime
+import atexit
+from datetime import datetime, timedelta
+from itertools import groupby
 from rich.console import Console
-from rich.table import Table
-from rich.live import Live
-from rich.panel import Panel
-from rich.align import Align
 from rich.text import Text
-from rich.columns import Columns
-from rich.layout import Layout
-from dateutil import parser
-from dateutil.relativedelta import relativedelta
 import time
-import threading
-import signal
-import sys
-from zoneinfo import ZoneInfo
-import platform
-import subprocess
+
+# Rich renderables are imported inside the functions that need them to keep
+# CLI startup fast
 
 console = Console()
-stop_tracking = threading.Event()
+
+CATEGORY_STYLE = {"work": "bold blue", "study": "bold green"}
+DEFAULT_STYLE = "bold yellow"
+_CONN = None
+
+SCHEMA_VERSION = 2
+# Rows are clustered by (start_time, id) so report range scans walk the table in order
+SQL_CREATE_TABLE = '''
+    CREATE TABLE {table} (
+        start_time INTEGER NOT NULL,
+        id INTEGER NOT NULL,
+        activity TEXT NOT NULL,
+        category TEXT NOT NULL,
+        end_time INTEGER,
+        duration INTEGER,
+        PRIMARY KEY (start_time, id)
+    ) WITHOUT ROWID
+'''
+
+# SQL is kept in constants so every call reuses sqlite3's cached statement
+SQL_SELECT_OPEN = 'SELECT id, activity, start_time FROM activities WHERE end_time IS NULL LIMIT 1'
+SQL_SELECT_OPEN_SESSION = '''
+    SELECT id, activity, start_time FROM activities
+    WHERE start_time = ? AND id = ? AND end_time IS NULL
+'''
+SQL_SELECT_LAST_ID = 'SELECT MAX(id) FROM activities WHERE start_time = ?'
+# Parameters are (activity, category, start_time, end_time, duration); id only
+# needs to break ties between rows starting in the same second
+SQL_INSERT = '''
+    INSERT INTO activities (start_time, id, activity, category, end_time, duration)
+    VALUES (?3, (SELECT COALESCE(MAX(id), 0) + 1 FROM activities WHERE start_time = ?3), ?1, ?2, ?4, ?5)
+'''
+# Duration (in whole minutes) is computed by SQLite from the stored start time
+SQL_UPDATE_STOP = '''
+    UPDATE activities 
+    SET end_time = :now, duration = (:now - start_time) / 60
+    WHERE start_time = :start AND id = :id
+'''
+SQL_SELECT_DURATION = 'SELECT duration FROM activities WHERE start_time = ? AND id = ?'
+SQL_REPORT = '''
+    SELECT activity, category, start_time, end_time, duration
+    FROM activities
+    WHERE end_time IS NOT NULL
+    AND start_time >= :start
+    AND (:category IS NULL OR category = :category)
+    ORDER BY activity, category, start_time DESC
+'''
+SQL_REPORT_TOTALS = '''
+    SELECT activity, category, SUM(duration) AS total
+    FROM activities
+    WHERE end_time IS NOT NULL
+    AND start_time >= :start
+    AND (:category IS NULL OR category = :category)
+    GROUP BY activity, category
+    ORDER BY total DESC
+'''
 
 def format_duration(seconds):
-    hours = seconds // 3600
-    minutes = (seconds % 3600) // 60
-    seconds = seconds % 60
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
     return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
 
-def get_system_timezone():
-    """Get the system timezone."""
-    if platform.system() == 'Darwin':  # macOS
-        try:
-            output = subprocess.check_output(['systemsetup', '-gettimezone']).decode()
-            return output.split(': ')[1].strip()
-        except:
-            return 'UTC'
-    return 'UTC'
+def to_local_datetime(timestamp):
+    """Convert an epoch to local time."""
+    # The C library resolves the UTC offset (including DST) for each timestamp
+    return datetime.fromtimestamp(timestamp).astimezone()
 
 def tracking_animation(activity, category, start_time):
-    with Live(refresh_per_second=1) as live:
-        while not stop_tracking.is_set():
-            duration = int((datetime.now() - start_time).total_seconds())
-            formatted_duration = format_duration(duration)
-            
-            panel_content = Text()
-            panel_content.append("🕒 Currently tracking\n", style="bold green")
-            panel_content.append(f"Activity: ", style="bold")
-            panel_content.append(f"{activity}\n", style="cyan")
-            panel_content.append(f"Category: ", style="bold")
-            panel_content.append(f"{category}\n", style="yellow")
-            panel_content.append(f"Duration: ", style="bold")
-            panel_content.append(formatted_duration, style="red")
-            
-            panel = Panel(
-                Align.center(panel_content),
-                title="[bold]TrackPy[/bold]",
-                border_style="green"
-            )
-            
-            live.update(panel)
-            time.sleep(1)
+    from rich.align import Align
+    from rich.live import Live
+    from rich.panel import Panel
+
+    # Anchor the elapsed time to the monotonic clock so wall-clock jumps don't skew it
+    t0 = time.monotonic() - (datetime.now() - start_time).total_seconds()
+
+    # The static lines are built once; each tick only swaps the duration at the end
+    panel_content = Text()
+    panel_content.append("🕒 Currently tracking\n", style="bold green")
+    panel_content.append(f"Activity: ", style="bold")
+    panel_content.append(f"{activity}\n", style="cyan")
+    panel_content.append(f"Category: ", style="bold")
+    panel_content.append(f"{category}\n", style="yellow")
+    panel_content.append(f"Duration: ", style="bold")
+    formatted_duration = format_duration(int(time.monotonic() - t0))
+    panel_content.append(formatted_duration, style="red")
+
+    # The panel wraps panel_content by reference, so it never needs rebuilding
+    panel = Panel(
+        Align.center(panel_content),
+        title="[bold]TrackPy[/bold]",
+        border_style="green"
+    )
+
+    # "HH:MM:" only changes once a minute, so it is reused between ticks
+    last_minute = None
+    prefix = ""
+
+    # Refreshes are driven from this loop; an auto-refresh thread could render
+    # panel_content while it is being mutated
+    with Live(panel, auto_refresh=False) as live:
+        try:
+            while True:
+                live.refresh()
+                # Sleep until the next whole second of elapsed time
+                time.sleep(max(0, 1 - ((time.monotonic() - t0) % 1)))
 
-def signal_handler(signum, frame):
-    stop_tracking.set()
-    console.print("\n[yellow]Stopping tracking... Use 'trackpy stop' to save the session.[/yellow]")
-    sys.exit(0)
+                minute, second = divmod(int(time.monotonic() - t0), 60)
+                if minute != last_minute:
+                    last_minute = minute
+                    prefix = format_duration(minute * 60)[:-2]
+                panel_content.right_crop(len(formatted_duration))
+                formatted_duration = prefix + str(second).zfill(2)
+                panel_content.append(formatted_duration, style="red")
+        except KeyboardInterrupt:
+            pass
 
-def init_db():
-    conn = sqlite3.connect('timetrack.db')
+def _connect():
+    """Open the database with per-connection performance pragmas."""
+    conn = sqlite3.connect('timetrack.db', isolation_level=None, timeout=5)
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-8000')
+    conn.execute('PRAGMA mmap_size=268435456')
+    conn.execute('PRAGMA busy_timeout=5000')
+    return conn
+
+def init_schema(conn):
     c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS activities (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            activity TEXT NOT NULL,
-            category TEXT NOT NULL,
-            start_time TIMESTAMP NOT NULL,
-            end_time TIMESTAMP,
-            duration INTEGER
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    # WAL mode is persistent, so it only needs to be set once
+    c.execute('PRAGMA journal_mode=WAL')
+
+    c.execute('PRAGMA user_version')
+    version = c.fetchone()[0]
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'activities'")
+    if c.fetchone() is None:
+        # Fresh database: create the current schema directly
+        c.execute(SQL_CREATE_TABLE.format(table='activities'))
+        c.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        version = SCHEMA_VERSION
+
+    # Version 1: timestamps are stored as integer unix epochs instead of
+    # naive local-time ISO strings
+    if version < 1:
+        c.execute('BEGIN IMMEDIATE')
+        c.execute('''
+            UPDATE activities
+            SET start_time = CAST(strftime('%s', start_time, 'utc') AS INTEGER),
+                end_time = CAST(strftime('%s', end_time, 'utc') AS INTEGER)
+            WHERE typeof(start_time) = 'text'
+        ''')
+        c.execute('PRAGMA user_version = 1')
+        c.execute('COMMIT')
+
+    # Version 2: the table is rebuilt WITHOUT ROWID, keyed by (start_time, id)
+    if version < 2:
+        c.execute('BEGIN IMMEDIATE')
+        c.execute(SQL_CREATE_TABLE.format(table='activities_new'))
+        c.execute('''
+            INSERT INTO activities_new (start_time, id, activity, category, end_time, duration)
+            SELECT start_time, id, activity, category, end_time, duration FROM activities
+        ''')
+        c.execute('DROP TABLE activities')
+        c.execute('ALTER TABLE activities_new RENAME TO activities')
+        c.execute('PRAGMA user_version = 2')
+        c.execute('COMMIT')
+
+    # At most one row is ongoing, so a partial index keeps that lookup tiny.
+    # Range filters on start_time use the primary key.
+    c.execute('CREATE INDEX IF NOT EXISTS idx_open ON activities(end_time) WHERE end_time IS NULL')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_act_cat ON activities(activity, category, start_time DESC)')
+
+def get_conn():
+    """Return the process-wide connection, opening it on first use."""
+    global _CONN
+    if _CONN is None:
+        _CONN = _connect()
+        init_schema(_CONN)
+    return _CONN
+
+def _close_conn():
+    if _CONN is not None:
+        _CONN.execute('PRAGMA optimize')
+        _CONN.close()
+
+atexit.register(_close_conn)
+
+def _bulk_insert(rows):
+    """Insert many (activity, category, start_time, end_time, duration) rows in one transaction."""
+    conn = get_conn()
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.executemany(SQL_INSERT, rows)
+
+def stop_current_activity(session=None):
+    """Stop the ongoing activity, returning (activity, duration) or None if nothing is tracked.
+
+    If session is a (start_time, id) key, only that row is stopped.
+    """
+    conn = get_conn()
+    c = conn.cursor()
+
+    with conn:
+        c.execute('BEGIN IMMEDIATE')
+        if session is None:
+            c.execute(SQL_SELECT_OPEN)
+        else:
+            c.execute(SQL_SELECT_OPEN_SESSION, session)
+        activity = c.fetchone()
+
+        if not activity:
+            return None
+
+        c.execute(SQL_UPDATE_STOP, {'now': int(time.time()), 'start': activity[2], 'id': activity[0]})
+        c.execute(SQL_SELECT_DURATION, (activity[2], activity[0]))
+        duration = c.fetchone()[0]
+
+    return activity[1], duration
 
 @click.group()
 def cli():
     """Time tracking application for work, study, and other activities."""
-    init_db()
 
 @cli.command()
 @click.argument('activity')
 @click.option('--category', '-c', default='work', help='Category of the activity (work/study/personal)')
 def start(activity, category):
     """Start tracking an activity."""
-    conn = sqlite3.connect('timetrack.db')
+    conn = get_conn()
     c = conn.cursor()
     
-    # Check if there's any ongoing activity
-    c.execute('SELECT * FROM activities WHERE end_time IS NULL')
-    ongoing = c.fetchone()
-    if ongoing:
-        console.print(f"[red]Error: Activity '{ongoing[1]}' is still ongoing. Stop it first.[/red]")
-        return
+    # The check and the insert share one transaction so two starts can't race
+    with conn:
+        c.execute('BEGIN IMMEDIATE')
 
-    now = datetime.now()
-    c.execute('''
-        INSERT INTO activities (activity, category, start_time)
-        VALUES (?, ?, ?)
-    ''', (activity, category, now))
-    
-    conn.commit()
-    conn.close()
+        # Check if there's any ongoing activity
+        c.execute(SQL_SELECT_OPEN)
+        ongoing = c.fetchone()
+        if ongoing:
+            console.print(f"[red]Error: Activity '{ongoing[1]}' is still ongoing. Stop it first.[/red]")
+            return
+
+        now = int(time.time())
+        c.execute(SQL_INSERT, (activity, category, now, None, None))
+        c.execute(SQL_SELECT_LAST_ID, (now,))
+        session = (now, c.fetchone()[0])
 
-    # Set up signal handler for graceful exit
-    signal.signal(signal.SIGINT, signal_handler)
-    
-    # Reset the stop event
-    stop_tracking.clear()
-    
     console.print(f"[green]Started tracking: {activity} ({category})[/green]")
     console.print("[yellow]Press Ctrl+C to stop tracking[/yellow]")
     
-    # Start the tracking animation
-    tracking_animation(activity, category, now)
+    # Start the tracking animation; it returns once Ctrl+C is pressed
+    tracking_animation(activity, category, datetime.fromtimestamp(now))
+
+    # Only stop the session started here; it may already have been stopped elsewhere
+    stopped = stop_current_activity(session)
+    if not stopped:
+        console.print(f"\n[yellow]Activity '{activity}' was already stopped.[/yellow]")
+        return
+
+    console.print(f"\n[green]Stopped tracking: {stopped[0]} (Duration: {stopped[1]} minutes)[/green]")
 
 @cli.command()
 def stop():
     """Stop tracking the current activity."""
-    conn = sqlite3.connect('timetrack.db')
-    c = conn.cursor()
-    
-    c.execute('SELECT * FROM activities WHERE end_time IS NULL')
-    activity = c.fetchone()
-    
-    if not activity:
+    stopped = stop_current_activity()
+    if not stopped:
         console.print("[red]No activity is currently being tracked.[/red]")
         return
 
-    now = datetime.now()
-    duration = (now - parser.parse(activity[3])).seconds // 60  # Duration in minutes
-    
-    c.execute('''
-        UPDATE activities 
-        SET end_time = ?, duration = ?
-        WHERE id = ?
-    ''', (now, duration, activity[0]))
-    
-    conn.commit()
-    conn.close()
-    console.print(f"[green]Stopped tracking: {activity[1]} (Duration: {duration} minutes)[/green]")
+    console.print(f"[green]Stopped tracking: {stopped[0]} (Duration: {stopped[1]} minutes)[/green]")
 
-def create_bar_chart(activities, max_width=40):
-    """Create a bar chart visualization of activities."""
-    if not activities:
+def create_bar_chart(totals, max_width=40):
+    """Create a bar chart visualization of (activity, category, total) rows."""
+    from rich.panel import Panel
+
+    if not totals:
         return Text("No data available")
     
-    # Find the maximum duration for scaling
-    max_duration = max(sum(session[4] for session in sessions) for activity, category, sessions in activities)
+    # Find the maximum duration for scaling (guard against all-zero totals)
+    max_duration = max(total for _, _, total in totals) or 1
     
     chart = Text()
     chart.append("📊 Time Distribution\n\n", style="bold cyan")
     
     # Calculate bar lengths and create bars
-    for activity, category, sessions in activities:
-        # Calculate total duration for activity
-        total_duration = sum(session[4] for session in sessions)
-        
+    for activity, category, total_duration in totals:
         # Calculate bar length
         bar_length = int((total_duration / max_duration) * max_width)
         bar = "█" * bar_length
         
         # Add category color based on name
-        if category.lower() == 'work':
-            color = "blue"
-        elif category.lower() == 'study':
-            color = "green"
-        else:
-            color = "yellow"
+        style = CATEGORY_STYLE.get(category.lower(), DEFAULT_STYLE)
         
         # Format duration in hours and minutes
         hours = total_duration // 60
@@ -187,7 +312,7 @@ def create_bar_chart(activities, max_width=40):
         
         # Create the bar line
         chart.append(f"{activity[:20]:<20} ")
-        chart.append(bar, style=color)
+        chart.append(bar, style=style)
         chart.append(f" {duration_str}\n")
     
     return Panel(chart, title="[bold]Activity Distribution[/bold]", border_style="cyan")
@@ -199,63 +324,52 @@ def create_bar_chart(activities, max_width=40):
 @click.option('--category', '-c', help='Filter by category')
 def report(period, category):
     """Generate a time tracking report."""
-    conn = sqlite3.connect('timetrack.db')
+    from rich.layout import Layout
+    from rich.panel import Panel
+    from rich.table import Table
+
+    conn = get_conn()
     c = conn.cursor()
 
     now = datetime.now()
-    timezone = get_system_timezone()
     
+    # The cutoff is bound as an integer epoch to match the start_time column
     if period == 'today':
         start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        start_ts = int(start_date.timestamp())
         period_str = "Today's Activity"
     elif period == 'week':
-        start_date = now - relativedelta(days=now.weekday())
+        start_date = now - timedelta(days=now.weekday())
         start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        start_ts = int(start_date.timestamp())
         period_str = "This Week's Activity"
     elif period == 'month':
         start_date = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        start_ts = int(start_date.timestamp())
         period_str = "This Month's Activity"
     else:  # all
-        start_date = datetime.min
+        start_ts = 0
         period_str = "All-Time Activity"
 
     if category:
         period_str += f" ({category})"
 
-    # First, get all activities with their categories
-    query = '''
-        SELECT DISTINCT activity, category
-        FROM activities
-        WHERE end_time IS NOT NULL
-        AND start_time >= ?
-    '''
-    params = [start_date]
+    params = {'start': start_ts, 'category': category}
 
-    if category:
-        query += ' AND category = ?'
-        params.append(category)
-
-    c.execute(query, params)
-    activities_list = c.fetchall()
-
-    # For each activity, get its sessions
-    activities_data = []
-    for activity, category in activities_list:
-        session_query = '''
-            SELECT activity, category, start_time, end_time, duration
-            FROM activities
-            WHERE activity = ? AND category = ?
-            AND end_time IS NOT NULL
-            AND start_time >= ?
-            ORDER BY start_time DESC
-        '''
-        session_params = [activity, category, start_date]
-        c.execute(session_query, session_params)
-        sessions = c.fetchall()
-        activities_data.append((activity, category, sessions))
-
-    # Sort activities by total duration
-    activities_data.sort(key=lambda x: sum(session[4] for session in x[2]), reverse=True)
+    # Both queries run in one read transaction so they see the same snapshot
+    with conn:
+        c.execute('BEGIN')
+
+        # Fetch every session in one query, ordered so rows group by activity
+        c.execute(SQL_REPORT, params)
+        sessions_by_activity = {
+            key: list(sessions)
+            for key, sessions in groupby(c.fetchall(), key=lambda row: (row[0], row[1]))
+        }
+
+        # Let SQLite total each activity, longest first
+        c.execute(SQL_REPORT_TOTALS, params)
+        totals = c.fetchall()
 
     # Create the table
     table = Table(show_header=True, header_style="bold magenta", title=period_str, title_style="bold cyan")
@@ -264,12 +378,15 @@ def report(period, category):
     table.add_column("Session Time")
     table.add_column("Duration")
 
-    for activity, category, sessions in activities_data:
+    for activity, category, _ in totals:
+        sessions = sessions_by_activity.get((activity, category), [])
+        category_text = Text(category, style=CATEGORY_STYLE.get(category.lower(), DEFAULT_STYLE))
+
         # Add a row for each session
         first_row = True
         for session in sessions:
-            start_time = parser.parse(session[2]).astimezone(ZoneInfo(timezone))
-            end_time = parser.parse(session[3]).astimezone(ZoneInfo(timezone))
+            start_time = to_local_datetime(session[2])
+            end_time = to_local_datetime(session[3])
             duration = session[4]
             
             # Format duration
@@ -284,7 +401,7 @@ def report(period, category):
             
             table.add_row(
                 activity if first_row else "",
-                Text(category, style="bold " + ("blue" if category.lower() == "work" else "green" if category.lower() == "study" else "yellow")) if first_row else "",
+                category_text if first_row else "",
                 session_time,
                 duration_str
             )
@@ -298,19 +415,17 @@ def report(period, category):
     layout = Layout()
     layout.split_column(
         Layout(Panel(table, border_style="cyan")),
-        Layout(create_bar_chart(activities_data))
+        Layout(create_bar_chart(totals))
     )
 
     console.print(layout)
     
     # Print total time
-    total_minutes = sum(sum(session[4] for session in sessions) for _, _, sessions in activities_data)
+    total_minutes = sum(total for _, _, total in totals)
     total_hours = total_minutes // 60
     remaining_minutes = total_minutes % 60
     console.print(f"\n[bold cyan]Total Time:[/bold cyan] [bold]{total_hours}h {remaining_minutes}m[/bold]")
 
-    conn.close()
-
 @cli.command()
 @click.option('--force', '-f', is_flag=True, help='Skip confirmation prompt')
 def clear(force):
@@ -320,17 +435,22 @@ def clear(force):
             console.print("[yellow]Operation cancelled.[/yellow]")
             return
 
-    conn = sqlite3.connect('timetrack.db')
+    conn = get_conn()
     c = conn.cursor()
     
-    # Get count of records before deletion
-    c.execute('SELECT COUNT(*) FROM activities')
-    count = c.fetchone()[0]
-    
-    # Delete all records
-    c.execute('DELETE FROM activities')
-    conn.commit()
-    conn.close()
+    with conn:
+        c.execute('BEGIN IMMEDIATE')
+
+        # Get count of records before deletion
+        c.execute('SELECT COUNT(*) FROM activities')
+        count = c.fetchone()[0]
+
+        # Delete all records (unqualified, so SQLite can truncate the table)
+        c.execute('DELETE FROM activities')
+
+    # Reclaim the freed pages when the user asked for a forced clear
+    if force:
+        c.execute('VACUUM')
     
     console.print(f"[green]✓ Successfully cleared {count} tracking records.[/green]")
 